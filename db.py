@@ -1,11 +1,28 @@
+import orjson
 from sqlmodel import create_engine, SQLModel, Session
 from config import DATABASE_URL
 
-engine = create_engine(DATABASE_URL, echo=True)
+def _json_serializer(obj) -> str:
+    # orjson returns bytes; the driver expects text for JSON parameters
+    return orjson.dumps(obj).decode()
+
+# Sized for concurrent FastAPI requests; pre-ping drops connections the
+# server has closed before a query is issued on them.
+engine = create_engine(
+    DATABASE_URL,
+    echo=True,
+    pool_size=20,
+    max_overflow=10,
+    pool_timeout=30,
+    pool_recycle=1800,
+    pool_pre_ping=True,
+    json_serializer=_json_serializer,
+    json_deserializer=orjson.loads,
+)
 
 def init_db():
     SQLModel.metadata.create_all(engine)
 
 def get_session():
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
@@ -1,20 +1,24 @@
+import asyncio
 import uvicorn
+from contextlib import asynccontextmanager
 from typing import Annotated, Optional
-import jwt
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlmodel import Session, select, delete, Column, JSON
-from datetime import datetime, timedelta
+from sqlmodel import Session, select
+from datetime import date, timedelta
 from db import get_session, init_db
-from config import SUPABASE_SECRET_KEY, JWT_ALGORITHM
+from config import SUPABASE_SECRET_KEY
 from models.trips import Trip
 from models.itineraries import Itinerary
-from models.user_profile import UserProfile, TravelerType, ActivityLevel
-from services.openai_service import OpenAIService
+from models.user_profile import UserProfile
+from services.openai_service import MAX_TRIP_DAYS, OpenAIService, completion_budget, get_client, load_encoding
 from services.auth_helpers import verify_token, extract_user_id
-import json
-import traceback
+import orjson
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Add the get_current_user dependency
 async def get_current_user(
@@ -28,10 +32,24 @@ async def get_current_user(
     user_id = extract_user_id(payload)
     return user_id
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Initialize the database, and create the pooled OpenAI client on the
+    # serving loop so the first itinerary request does not pay for its setup
+    init_db()
+    get_client()
+    # Loading the tokenizer can hit the network, so keep it off the event loop
+    await asyncio.to_thread(load_encoding)
+    yield
+    # Release pooled OpenAI connections on shutdown
+    await OpenAIService.close()
+
 app = FastAPI(
     title="Trip Planner API",
     description="API for managing travel itineraries",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 origins = [
@@ -67,15 +85,8 @@ security_scheme = {
 app.openapi_components = {"securitySchemes": security_scheme}
 app.openapi_security = [{"Bearer": []}]
 
-async def generate_itinerary(trip: Trip, user_profile: Optional[UserProfile] = None) -> str:
-    """Generate a detailed itinerary using OpenAI based on trip details."""
-    ai_service = OpenAIService()
-    
-    print("\n=== Generating Itinerary ===")
-    print(f"Trip ID: {trip.id}")
-    print(f"Destination: {trip.destination}")
-    print(f"Date Range: {trip.start_date} to {trip.end_date}")
-    
+def build_itinerary_prompt(trip: Trip, user_profile: Optional[UserProfile] = None) -> str:
+    """Build the user prompt describing the trip and the traveler's preferences."""
     prompt = f"""
     Create a detailed itinerary with the following structure:
     ACCOMMODATION
@@ -111,20 +122,49 @@ async def generate_itinerary(trip: Trip, user_profile: Optional[UserProfile] = N
         User Preferences:
         - Traveler Type: {user_profile.traveler_type.value if user_profile.traveler_type else 'Not specified'}
         - Activity Level: {user_profile.activity_level.value if user_profile.activity_level else 'Not specified'}
-        - Budget: {user_profile.budget_preference.value if user_profile.budget_preference else 'Not specified'}
+        - Budget: {user_profile.budget_preference.name if user_profile.budget_preference else 'Not specified'}
         - Special Interests: {user_profile.special_interests or 'Not specified'}
         - Dietary Preferences: {user_profile.dietary_preferences or 'Not specified'}
         - Accessibility Needs: {user_profile.accessibility_needs or 'Not specified'}
         - Languages: {user_profile.preferred_languages or 'Not specified'}
         """
     
+    return prompt
+
+def trip_length(trip: Trip) -> int:
+    """Return the number of days in the trip, rejecting ranges no itinerary is generated for."""
+    # Request bodies are not validated into table models, so the dates may still be strings
     try:
-        print("\nSending prompt to OpenAI...")
-        response = await ai_service.generate_trip_plan(prompt)
-        print("\nReceived response from OpenAI")
-        return response
-    except Exception as e:
-        print(f"OpenAI API error: {str(e)}")
+        start_date, end_date = (date.fromisoformat(str(value)) for value in (trip.start_date, trip.end_date))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start_date and end_date must be YYYY-MM-DD dates")
+    num_days = (end_date - start_date).days + 1
+    if num_days < 1:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    if num_days > MAX_TRIP_DAYS:
+        raise HTTPException(status_code=400, detail=f"Trips can be at most {MAX_TRIP_DAYS} days long")
+    return num_days
+
+async def generate_itinerary(trip: Trip, user_profile: Optional[UserProfile] = None) -> dict:
+    """Generate a detailed, validated itinerary using OpenAI based on trip details."""
+    ai_service = OpenAIService()
+    num_days = trip_length(trip)
+    
+    logger.info(
+        "Generating itinerary for trip %s: %s, %s to %s",
+        trip.id, trip.destination, trip.start_date, trip.end_date
+    )
+    
+    prompt = build_itinerary_prompt(trip, user_profile)
+    
+    try:
+        if num_days > 1:
+            # One call per day in parallel instead of one long serial generation
+            dates = [trip.start_date + timedelta(days=offset) for offset in range(num_days)]
+            return await ai_service.generate_trip_plan_by_day(prompt, dates)
+        return await ai_service.generate_validated_trip_plan(prompt, completion_budget(num_days))
+    except Exception:
+        logger.exception("OpenAI API error for trip %s", trip.id)
         raise HTTPException(status_code=500, detail="Failed to generate itinerary")
 
 @app.get("/")
@@ -139,6 +179,8 @@ async def create_trip(
     session: Session = Depends(get_session)
 ):
     """Create a new trip and generate its itinerary."""
+    # Checked before anything is saved, and outside the try so the 400 is not turned into a 500
+    trip_length(trip)
     try:
         # Get or create user profile
         user_profile = session.exec(
@@ -146,11 +188,12 @@ async def create_trip(
         ).first()
         
         if not user_profile:
+            # Inserted in the same flush as the trip below; the unit of work
+            # orders it ahead of the trip because of the foreign key.
             user_profile = UserProfile(user_id=user_id)
             session.add(user_profile)
-            session.commit()
-            print("Created new user profile")
-        
+            logger.info("Created new user profile for %s", user_id)
+
         # Set the user_id on the trip
         trip.user_id = user_id
         session.add(trip)
@@ -158,15 +201,7 @@ async def create_trip(
         session.refresh(trip)
         
         try:
-            print("\n=== Generating OpenAI Content ===")
-            itinerary_content = await generate_itinerary(trip, user_profile)
-            print("\nRaw OpenAI Response:")
-            print(itinerary_content)
-            
-            print("\n=== Parsing OpenAI Response ===")
-            structured_data = OpenAIService.parse_itinerary_response(itinerary_content)
-            print("Parsed Data Structure:")
-            print(json.dumps(structured_data, indent=2))
+            structured_data = await generate_itinerary(trip, user_profile)
             
             # Create new Itinerary object
             new_itinerary = Itinerary(
@@ -186,10 +221,8 @@ async def create_trip(
             session.add(new_itinerary)
             session.commit()
             
-        except Exception as e:
-            print(f"\nERROR in itinerary generation: {str(e)}")
-            print(f"Error type: {type(e)}")
-            print(f"Error traceback: {traceback.format_exc()}")
+        except Exception:
+            logger.exception("Itinerary generation failed for trip %s", trip.id)
             session.rollback()
             raise
         
@@ -207,7 +240,7 @@ async def create_trip(
         }
     
     except Exception as e:
-        print(f"Error in create_trip: {str(e)}")
+        logger.exception("Error in create_trip")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/trips")
@@ -218,8 +251,10 @@ async def get_trips(
     favorites_only: bool = False
 ):
     """Get all trips for the authenticated user."""
-    print(f"Fetching trips for user: {user_id}")
-    print(f"Filters - show_unpublished: {show_unpublished}, favorites_only: {favorites_only}")
+    logger.debug(
+        "Fetching trips for user %s (show_unpublished=%s, favorites_only=%s)",
+        user_id, show_unpublished, favorites_only
+    )
     
     query = select(Trip).where(Trip.user_id == user_id)
     
@@ -230,7 +265,7 @@ async def get_trips(
         query = query.where(Trip.is_favorite == True)
     
     trips = session.exec(query).all()
-    print(f"Found {len(trips)} trips")
+    logger.debug("Found %d trips", len(trips))
     
     return trips
 
@@ -291,34 +326,12 @@ async def get_itinerary(
     try:
         daily_schedule = itinerary.daily_schedule
         if isinstance(daily_schedule, str):
-            daily_schedule = json.loads(daily_schedule)
-    except (json.JSONDecodeError, TypeError):
+            daily_schedule = orjson.loads(daily_schedule)
+    except (orjson.JSONDecodeError, TypeError):
         daily_schedule = []
     
-    # Add debug logging
-    print("Raw itinerary data:", {
-        "accommodation": itinerary.accommodation,
-        "hotel_name": itinerary.hotel_name if hasattr(itinerary, 'hotel_name') else None
-    })
-
-    # Parse accommodation data from the response
-    accommodation = []
-    if itinerary.accommodation:
-        # Use the complete accommodation array from the response
-        accommodation = itinerary.accommodation
-    elif hasattr(itinerary, 'hotel_name') and itinerary.hotel_name:
-        # Fallback for legacy single hotel
-        accommodation = [{
-            "name": itinerary.hotel_name,
-            "description": itinerary.hotel_description or "",
-            "location": itinerary.hotel_location or "",
-            "rating": float(itinerary.hotel_rating or 4.5),
-            "nightly_rate": "200",
-            "url": "#"
-        }]
-
-    # Log final accommodation data
-    print("Final accommodation data:", accommodation)
+    # Accommodation lives in the itineraries.accommodation JSON column
+    accommodation = itinerary.accommodation or []
 
     return {
         "id": itinerary.id,
@@ -334,6 +347,52 @@ async def get_itinerary(
         "status": itinerary.status
     }
 
+@app.get("/trips/{trip_id}/itinerary/stream")
+async def stream_itinerary(
+    trip_id: int,
+    user_id: Annotated[str, Depends(get_current_user)],
+    session: Session = Depends(get_session),
+    accept: Annotated[Optional[str], Header()] = None
+):
+    """Stream a freshly generated itinerary for a trip as server-sent events.
+
+    An "accommodation" event is sent as soon as the hotels are generated, then
+    a "day" event per daily_schedule entry and a "travel_tips" event; a final
+    "done" event marks the end of the stream, or an "error" event if generation
+    was cut short or the itinerary did not validate. Clients whose Accept header
+    rules out text/event-stream get the complete itinerary as one JSON body
+    instead. Nothing is persisted.
+    """
+    trip = session.get(Trip, trip_id)
+    if not trip:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    
+    if trip.user_id != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to view this trip")
+    
+    user_profile = session.exec(
+        select(UserProfile).where(UserProfile.user_id == user_id)
+    ).first()
+    if accept and "text/event-stream" not in accept and "*/*" not in accept:
+        return await generate_itinerary(trip, user_profile)
+
+    prompt = build_itinerary_prompt(trip, user_profile)
+    max_tokens = completion_budget(trip_length(trip))
+    
+    async def event_stream():
+        try:
+            async for section, value in OpenAIService.stream_trip_plan_sections(prompt, max_tokens):
+                # JSON-encode so newlines inside a value cannot break SSE framing
+                yield f"event: {section}\ndata: {orjson.dumps(value).decode()}\n\n"
+        except Exception:
+            # Headers are already sent, so report the failure in-band instead of "done"
+            logger.exception("Itinerary stream failed for trip %s", trip.id)
+            yield 'event: error\ndata: {"detail": "Failed to generate itinerary"}\n\n'
+            return
+        yield "event: done\ndata: {}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @app.delete("/trips/{trip_id}")
 async def delete_trip(
     trip_id: int,
@@ -433,11 +492,6 @@ async def toggle_favorite(
     }
 
 
-# Initialize database on startup
-@app.on_event("startup")
-async def on_startup():
-    init_db()
-
 # Run the application
 if __name__ == "__main__":
     uvicorn.run("main:app", host="localhost", port=8000, reload=True)
\ No newline at end of file
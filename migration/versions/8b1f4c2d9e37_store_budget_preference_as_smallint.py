@@ -0,0 +1,76 @@
+"""store_budget_preference_as_smallint
+
+Revision ID: 8b1f4c2d9e37
+Revises: 16e103baf430
+Create Date: 2024-11-20 10:12:44.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b1f4c2d9e37'
+down_revision: Union[str, None] = '16e103baf430'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 202016e7b234 created the type with daily_budget_* labels and the later
+    # "update values" revisions are empty, so rows may hold either set of labels.
+    # Refuse to migrate anything else rather than silently nulling it out.
+    op.execute("""
+        DO $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM user_profiles
+                WHERE budget_preference::text NOT IN (
+                    'BUDGET', 'COMFORT', 'PREMIUM', 'LUXURY', 'ULTRA_LUXURY',
+                    'daily_budget_50_100', 'daily_budget_100_200', 'daily_budget_200_500',
+                    'daily_budget_500_1000', 'daily_budget_1000_plus'
+                )
+            ) THEN
+                RAISE EXCEPTION 'user_profiles.budget_preference holds values with no BudgetPreference tier';
+            END IF;
+        END $$
+    """)
+    # Map the tier names onto the IntEnum values used by BudgetPreference, and
+    # each legacy daily range onto the nearest tier by its lower bound
+    op.execute("""
+        ALTER TABLE user_profiles
+        ALTER COLUMN budget_preference TYPE smallint
+        USING CASE budget_preference::text
+            WHEN 'BUDGET' THEN 1
+            WHEN 'COMFORT' THEN 2
+            WHEN 'PREMIUM' THEN 3
+            WHEN 'LUXURY' THEN 4
+            WHEN 'ULTRA_LUXURY' THEN 5
+            WHEN 'daily_budget_50_100' THEN 1
+            WHEN 'daily_budget_100_200' THEN 1
+            WHEN 'daily_budget_200_500' THEN 2
+            WHEN 'daily_budget_500_1000' THEN 3
+            WHEN 'daily_budget_1000_plus' THEN 4
+        END
+    """)
+    op.execute("DROP TYPE IF EXISTS budgetpreference")
+
+
+def downgrade() -> None:
+    budget_enum = sa.Enum('BUDGET', 'COMFORT', 'PREMIUM', 'LUXURY', 'ULTRA_LUXURY',
+                          name='budgetpreference')
+    budget_enum.create(op.get_bind())
+
+    op.execute("""
+        ALTER TABLE user_profiles
+        ALTER COLUMN budget_preference TYPE budgetpreference
+        USING CASE budget_preference
+            WHEN 1 THEN 'BUDGET'
+            WHEN 2 THEN 'COMFORT'
+            WHEN 3 THEN 'PREMIUM'
+            WHEN 4 THEN 'LUXURY'
+            WHEN 5 THEN 'ULTRA_LUXURY'
+        END::budgetpreference
+    """)
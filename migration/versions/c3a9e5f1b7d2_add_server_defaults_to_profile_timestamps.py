@@ -0,0 +1,40 @@
+"""add_server_defaults_to_profile_timestamps
+
+Revision ID: c3a9e5f1b7d2
+Revises: 8b1f4c2d9e37
+Create Date: 2024-11-20 11:03:18.274610
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a9e5f1b7d2'
+down_revision: Union[str, None] = '8b1f4c2d9e37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column('user_profiles', 'created_at',
+               existing_type=sa.DateTime(),
+               server_default=sa.func.timezone('UTC', sa.func.now()),
+               existing_nullable=False)
+    op.alter_column('user_profiles', 'updated_at',
+               existing_type=sa.DateTime(),
+               server_default=sa.func.timezone('UTC', sa.func.now()),
+               existing_nullable=False)
+
+
+def downgrade() -> None:
+    op.alter_column('user_profiles', 'updated_at',
+               existing_type=sa.DateTime(),
+               server_default=None,
+               existing_nullable=False)
+    op.alter_column('user_profiles', 'created_at',
+               existing_type=sa.DateTime(),
+               server_default=None,
+               existing_nullable=False)
@@ -41,9 +41,4 @@ class Itinerary(Base, table=True):
     # Status and Preferences  
     is_published: bool = Field(default=True)
     is_favorite: bool = Field(default=False)
-    status: str = Field(default="active")
-
-    class Config:
-        json_encoders = {
-            date: lambda v: v.isoformat()
-        }
\ No newline at end of file
+    status: str = Field(default="active")
\ No newline at end of file
@@ -0,0 +1,120 @@
+import re
+from datetime import date
+from typing import Annotated
+
+from pydantic import AfterValidator, BaseModel, ConfigDict
+
+# Schema for the itinerary JSON returned by OpenAI. extra="forbid" emits
+# additionalProperties: false, which strict structured outputs require.
+
+ISO_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+MIN_RATING = 4.2
+MAX_RATING = 5.0
+
+# Strict structured outputs reject minimum/maximum/pattern keywords, so these
+# rules run as after-validators: enforced during model_validate_json but left
+# out of the JSON schema sent to OpenAI.
+def _check_rating(value: float) -> float:
+    if not MIN_RATING <= value <= MAX_RATING:
+        raise ValueError(f"rating must be between {MIN_RATING} and {MAX_RATING}")
+    return value
+
+def _check_iso_date(value: str) -> str:
+    if not ISO_DATE_RE.fullmatch(value):
+        raise ValueError("date must be YYYY-MM-DD")
+    date.fromisoformat(value)
+    return value
+
+def _check_non_empty(value: list) -> list:
+    if not value:
+        raise ValueError("must contain at least one entry")
+    return value
+
+Rating = Annotated[float, AfterValidator(_check_rating)]
+IsoDate = Annotated[str, AfterValidator(_check_iso_date)]
+
+class Hotel(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    name: str
+    description: str
+    location: str
+    rating: Rating
+    unique_features: str
+    nightly_rate: int
+    url: str
+
+class Meal(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    spot: str
+    rating: Rating
+    description: str
+    url: str
+
+class Activity(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    activity: str
+    description: str
+    url: str
+
+class DaySchedule(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    day_number: int
+    date: IsoDate
+    breakfast: Meal
+    morning_activity: Activity
+    lunch: Meal
+    afternoon_activity: Activity
+    dinner: Meal
+    evening_activity: Activity
+
+class TravelTips(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    weather: str
+    transportation: str
+    cultural_notes: str
+
+class TripPlan(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    accommodation: Annotated[list[Hotel], AfterValidator(_check_non_empty)]
+    daily_schedule: Annotated[list[DaySchedule], AfterValidator(_check_non_empty)]
+    travel_tips: TravelTips
+
+# The names picked for one day, so per-day calls can be told what to plan
+class DayOutline(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    day_number: int
+    breakfast: str
+    morning_activity: str
+    lunch: str
+    afternoon_activity: str
+    dinner: str
+    evening_activity: str
+
+# The parts of a TripPlan that are generated once per trip when days are fanned out
+class TripOverview(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    accommodation: Annotated[list[Hotel], AfterValidator(_check_non_empty)]
+    day_outlines: Annotated[list[DayOutline], AfterValidator(_check_non_empty)]
+    travel_tips: TravelTips
+
+def _response_format(name: str, model: type[BaseModel]) -> dict:
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": model.model_json_schema()
+        }
+    }
+
+TRIP_PLAN_RESPONSE_FORMAT = _response_format("trip_plan", TripPlan)
+TRIP_OVERVIEW_RESPONSE_FORMAT = _response_format("trip_overview", TripOverview)
+DAY_SCHEDULE_RESPONSE_FORMAT = _response_format("day_schedule", DaySchedule)
@@ -1,6 +1,9 @@
-from sqlmodel import Field, SQLModel, Relationship
+from sqlmodel import Field, SQLModel, Relationship, Column
+from sqlalchemy import DateTime, SmallInteger, func
+from sqlalchemy.types import TypeDecorator
+from pydantic import field_serializer
 from typing import Optional, List, TYPE_CHECKING
-from enum import Enum
+from enum import Enum, IntEnum
 from datetime import datetime
 from .base import Base
 
@@ -18,35 +21,55 @@ class ActivityLevel(str, Enum):
     MODERATE = "moderate"
     ACTIVE = "active"
 
-class BudgetPreference(str, Enum):
-    BUDGET = "BUDGET"      # $100-200 per day
-    COMFORT = "COMFORT"    # $200-400 per day
-    PREMIUM = "PREMIUM"    # $400-800 per day  
-    LUXURY = "LUXURY"      # $800-1500 per day
-    ULTRA_LUXURY = "ULTRA_LUXURY"  # $1500+ per day
+_BUDGET_RANGES = (
+    (100, 200),
+    (200, 400),
+    (400, 800),
+    (800, 1500),
+    (1500, float('inf')),
+)
 
+_BUDGET_DESCRIPTIONS = (
+    "Budget-friendly options, $100-200 per day",
+    "Mid-range comfort, $200-400 per day",
+    "Premium experiences, $400-800 per day",
+    "Luxury accommodations and dining, $800-1500 per day",
+    "Ultra-luxury with no expense spared, $1500+ per day",
+)
+
+class BudgetPreference(IntEnum):
+    BUDGET = 1        # $100-200 per day
+    COMFORT = 2       # $200-400 per day
+    PREMIUM = 3       # $400-800 per day
+    LUXURY = 4        # $800-1500 per day
+    ULTRA_LUXURY = 5  # $1500+ per day
+
+    @classmethod
+    def _missing_(cls, value):
+        """Accept member names (e.g. "BUDGET") so existing clients keep working"""
+        if isinstance(value, str):
+            return cls.__members__.get(value.upper())
+        return None
 
     def get_budget_range(self) -> tuple[int, int]:
         """Returns the daily budget range in USD for this preference level"""
-        ranges = {
-            "BUDGET": (100, 200),
-            "COMFORT": (200, 400),
-            "PREMIUM": (400, 800),
-            "LUXURY": (800, 1500),
-            "ULTRA_LUXURY": (1500, float('inf'))
-        }
-        return ranges[self.value]
+        return _BUDGET_RANGES[self - 1]
     
     def get_description(self) -> str:
         """Returns a human-readable description of this budget level"""
-        descriptions = {
-            "BUDGET": "Budget-friendly options, $100-200 per day",
-            "COMFORT": "Mid-range comfort, $200-400 per day",
-            "PREMIUM": "Premium experiences, $400-800 per day",
-            "LUXURY": "Luxury accommodations and dining, $800-1500 per day",
-            "ULTRA_LUXURY": "Ultra-luxury with no expense spared, $1500+ per day"
-        }
-        return descriptions[self.value]
+        return _BUDGET_DESCRIPTIONS[self - 1]
+
+
+class BudgetPreferenceType(TypeDecorator):
+    """Stores BudgetPreference as a smallint and loads it back as the enum."""
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else int(BudgetPreference(value))
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else BudgetPreference(value)
 
 
 class UserProfile(Base, table=True):
@@ -59,9 +82,23 @@ class UserProfile(Base, table=True):
     dietary_preferences: Optional[str] = Field(default=None)
     accessibility_needs: Optional[str] = Field(default=None)
     preferred_languages: Optional[str] = Field(default=None)
-    budget_preference: Optional[BudgetPreference] = Field(default=None)
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    budget_preference: Optional[BudgetPreference] = Field(
+        default=None,
+        sa_column=Column(BudgetPreferenceType())
+    )
+    created_at: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime, server_default=func.timezone("UTC", func.now()), nullable=False)
+    )
+    updated_at: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime, server_default=func.timezone("UTC", func.now()), onupdate=func.timezone("UTC", func.now()), nullable=False)
+    )
 
     trips: List["Trip"] = Relationship(back_populates="user_profile")
 
+    @field_serializer("budget_preference")
+    def serialize_budget_preference(self, value: Optional[BudgetPreference]) -> Optional[str]:
+        """Keep the API representation as the tier name rather than the stored int"""
+        return value.name if value is not None else None
+
@@ -1,7 +1,19 @@
+import base64
+import logging
 import jwt
+from functools import lru_cache
+from jwt import PyJWK
 from fastapi import HTTPException
 from typing import Tuple
 
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=None)
+def _signing_key(secret_key: str) -> PyJWK:
+    """Build the HS256 key once per secret; jwt.decode skips key preparation for a PyJWK."""
+    encoded = base64.urlsafe_b64encode(secret_key.encode()).rstrip(b'=').decode()
+    return PyJWK({"kty": "oct", "k": encoded}, algorithm="HS256")
+
 def verify_token(token: str, secret_key: str) -> dict:
     """Verify JWT token and return decoded payload."""
     try:
@@ -17,13 +29,13 @@ def verify_token(token: str, secret_key: str) -> dict:
                 "verify_aud": False
             }
         )
-        print(f"Unverified token payload: {unverified_payload}")
+        logger.debug("Unverified token payload: %s", unverified_payload)
         
         # For Supabase tokens, get the user ID from auth metadata
         if unverified_payload.get('iss') == 'supabase':
             metadata = jwt.decode(
                 token,
-                secret_key,
+                _signing_key(secret_key),
                 algorithms=["HS256"],
                 options={
                     "verify_aud": False
@@ -36,7 +48,7 @@ def verify_token(token: str, secret_key: str) -> dict:
         return unverified_payload
         
     except Exception as e:
-        print(f"Token verification error: {str(e)}")
+        logger.warning("Token verification error: %s", e)
         raise HTTPException(
             status_code=401,
             detail=f"Token verification failed: {str(e)}"
@@ -44,25 +56,27 @@ def verify_token(token: str, secret_key: str) -> dict:
 
 def extract_user_id(payload: dict) -> str:
     """Extract user ID from JWT payload."""
-    # For Supabase tokens, prioritize these fields in order:
-    user_id = (
-        payload.get('sub') or  # Standard JWT subject claim
-        payload.get('user_id') or  # Our custom claim from verify_token
-        payload.get('id') or  # Alternative Supabase claim
-        payload.get('user', {}).get('id')  # Nested user object
-    )
+    # For Supabase tokens, check these fields in order and return on the first hit:
+    user_id = payload.get('sub')  # Standard JWT subject claim
+    if user_id:
+        return user_id
     
-    if not user_id and payload.get('role') == 'anon':
-        raise HTTPException(
-            status_code=401,
-            detail="Anonymous access not allowed. Please sign in."
-        )
+    user_id = payload.get('user_id') or payload.get('id')  # Our custom claim / alternative Supabase claim
+    if user_id:
+        return user_id
+    
+    user = payload.get('user')  # Nested user object
+    if user and (user_id := user.get('id')):
+        return user_id
     
-    if not user_id:
-        print(f"Available claims in payload: {list(payload.keys())}")
+    if payload.get('role') == 'anon':
         raise HTTPException(
             status_code=401,
-            detail="Could not extract user ID from token"
+            detail="Anonymous access not allowed. Please sign in."
         )
     
-    return user_id
\ No newline at end of file
+    logger.warning("No user ID claim in token; available claims: %s", list(payload))
+    raise HTTPException(
+        status_code=401,
+        detail="Could not extract user ID from token"
+    )
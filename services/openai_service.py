@@ -1,407 +1,650 @@
 import os
-from openai import OpenAI
-from typing import Optional
-import re
-import unicodedata
-import traceback
-import json
-from datetime import datetime, date
+import copy
+import asyncio
+import logging
+import httpx
+import tiktoken
+from functools import lru_cache, partial
+from openai import (
+    AsyncOpenAI,
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    OpenAIError,
+    RateLimitError,
+)
+from tenacity import (
+    before_sleep_log,
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+from typing import Any, AsyncIterator, Final, Optional
+from datetime import date
+from pydantic import BaseModel, ValidationError
+from models.trip_plan import (
+    DaySchedule,
+    TripOverview,
+    TripPlan,
+    DAY_SCHEDULE_RESPONSE_FORMAT,
+    TRIP_OVERVIEW_RESPONSE_FORMAT,
+    TRIP_PLAN_RESPONSE_FORMAT,
+)
+from services.rate_limiter import RateLimiter
+from services.response_cache import ResponseCache
+from services.section_stream import SectionStream
 
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+logger = logging.getLogger(__name__)
 
-class OpenAIService:
-    SYSTEM_INSTRUCTIONS = """You are a travel planning API that MUST return responses in this exact JSON format. Your response must be valid JSON only - no other text or content is allowed.
-
-Required format:
-{
-  "accommodation": [
-    {
-      "name": "string (required)",
-      "description": "string (2-3 sentences, required)",
-      "location": "string (required)",
-      "rating": "number between 4.2 and 5.0 (required)",
-      "unique_features": "string (required)",
-      "nightly_rate": "number (required, NEVER use currency symbols, just the numeric value)",
-      "url": "string URL (required)"
+_client: Optional[AsyncOpenAI] = None
+
+def get_client() -> AsyncOpenAI:
+    """Return the shared AsyncOpenAI client, creating it on first use.
+
+    Created lazily so the client and its connection pool belong to the event
+    loop serving requests rather than whatever loop existed at import time.
+    """
+    global _client
+    if _client is None:
+        # One pooled HTTP/2 transport shared by every OpenAI call; closed on app shutdown
+        http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(connect=5.0, read=60.0, write=10.0, pool=5.0),
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100, keepalive_expiry=60.0)
+        )
+        # Retries are handled by _create_chat_completion, so the SDK's own retry loop is off
+        _client = AsyncOpenAI(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            max_retries=0,
+            http_client=http_client
+        )
+    return _client
+
+# Upper bound on in-flight chat completion calls across all callers; tune to the account's RPM/TPM
+inflight_semaphore = asyncio.Semaphore(int(os.getenv('OPENAI_CONCURRENCY', '20')))
+
+# Client-side RPM/TPM budget; set to the account's limits for the configured model
+rate_limiter = RateLimiter(
+    requests_per_minute=float(os.getenv('OPENAI_RPM', '500')),
+    tokens_per_minute=float(os.getenv('OPENAI_TPM', '30000'))
+)
+
+# Completion allowance used in token estimates when a request sets no max_tokens
+_DEFAULT_COMPLETION_TOKENS = 4000
+
+# Output token ceilings: hotels plus travel tips, and one daily_schedule entry
+_OVERVIEW_COMPLETION_TOKENS = 800
+_DAY_COMPLETION_TOKENS = 600
+# Per-day allowance for the day_outlines the overview adds when days are fanned out
+_OUTLINE_DAY_COMPLETION_TOKENS = 100
+# Output token limit of gpt-4o and gpt-4o-mini; larger max_tokens is rejected with a 400
+_MAX_COMPLETION_TOKENS = int(os.getenv('OPENAI_MAX_COMPLETION_TOKENS', '16384'))
+
+def completion_budget(num_days: int) -> int:
+    """max_tokens for a full itinerary of num_days, sized to fit without truncation.
+
+    Clamped to the model's output limit, and to at least one day's allowance
+    when num_days is zero or negative (an end_date before the start_date).
+    """
+    budget = _OVERVIEW_COMPLETION_TOKENS + _DAY_COMPLETION_TOKENS * num_days
+    return max(_DAY_COMPLETION_TOKENS, min(budget, _MAX_COMPLETION_TOKENS))
+
+# Longest trip an itinerary is generated for. Bounds the per-day fan-out to
+# MAX_TRIP_DAYS + 1 calls and keeps a single-call plan within the output limit.
+MAX_TRIP_DAYS = int(os.getenv('MAX_TRIP_DAYS', '14'))
+
+# Requests are sent at temperature 0, so identical prompts can reuse the completion
+response_cache = ResponseCache(
+    ttl_seconds=float(os.getenv('OPENAI_CACHE_TTL', '86400')),
+    max_entries=int(os.getenv('OPENAI_CACHE_SIZE', '1000'))
+)
+# Validated itinerary dicts under the same request keys, so repeat prompts skip parsing too.
+# Entries are shared between callers and must be treated as read-only.
+parsed_cache = ResponseCache(
+    ttl_seconds=response_cache.ttl_seconds,
+    max_entries=response_cache.max_entries
+)
+# The strict schemas are several KB each and sent with every request, so hash them once
+for _response_format in (TRIP_PLAN_RESPONSE_FORMAT, TRIP_OVERVIEW_RESPONSE_FORMAT, DAY_SCHEDULE_RESPONSE_FORMAT):
+    ResponseCache.register_static(_response_format)
+
+def _log_prompt_cache_usage(usage) -> None:
+    """Log how much of the prompt OpenAI served from its prefix cache."""
+    if not usage or not usage.prompt_tokens:
+        return
+    details = usage.prompt_tokens_details
+    cached = (details.cached_tokens or 0) if details else 0
+    logger.info(
+        "Prompt cache: %d/%d prompt tokens cached (%.0f%%)",
+        cached, usage.prompt_tokens, 100 * cached / usage.prompt_tokens
+    )
+
+def _empty_meal(rating: float = 0.0) -> dict:
+    return {"spot": "", "rating": rating, "description": "", "url": ""}
+
+def _empty_activity() -> dict:
+    return {"activity": "", "description": "", "url": ""}
+
+def _empty_day(day_number: int, day_date: str, rating: float = 0.0) -> dict:
+    """Build a daily_schedule entry with every meal and activity slot present."""
+    return {
+        "day_number": day_number,
+        "date": day_date,
+        "breakfast": _empty_meal(rating),
+        "morning_activity": _empty_activity(),
+        "lunch": _empty_meal(rating),
+        "afternoon_activity": _empty_activity(),
+        "dinner": _empty_meal(rating),
+        "evening_activity": _empty_activity()
     }
-  ],
-  "daily_schedule": [
-    {
-      "day_number": "number (required)",
-      "date": "YYYY-MM-DD (required)",
-      "breakfast": {
-        "spot": "string (required)",
-        "rating": "number between 4.2 and 5.0 (required)",
-        "description": "string (1-2 sentences, required)",
-        "url": "string URL (required)"
-      },
-      "morning_activity": {
-        "activity": "string (required)",
-        "description": "string (2-3 sentences, required)",
-        "url": "string URL (required)"
-      },
-      "lunch": {
-        "spot": "string (required)",
-        "rating": "number between 4.2 and 5.0 (required)",
-        "description": "string (1-2 sentences, required)",
-        "url": "string URL (required)"
-      },
-      "afternoon_activity": {
-        "activity": "string (required)",
-        "description": "string (2-3 sentences, required)",
-        "url": "string URL (required)"
-      },
-      "dinner": {
-        "spot": "string (required)",
-        "rating": "number between 4.2 and 5.0 (required)",
-        "description": "string (1-2 sentences, required)",
-        "url": "string URL (required)"
-      },
-      "evening_activity": {
-        "activity": "string (required)",
-        "description": "string (2-3 sentences, required)",
-        "url": "string URL (required)"
-      }
+
+# daily_schedule slots, used to compare the names picked for each day
+_MEAL_SLOTS = ('breakfast', 'lunch', 'dinner')
+_ACTIVITY_SLOTS = ('morning_activity', 'afternoon_activity', 'evening_activity')
+_DAY_SLOTS = ('breakfast', 'morning_activity', 'lunch', 'afternoon_activity', 'dinner', 'evening_activity')
+
+# Returned when a response cannot be validated; shaped like a TripPlan. The
+# day's date is filled in per use.
+_DEFAULT_TRIP_PLAN = {
+    "accommodation": [{
+        "name": "Default Hotel",
+        "description": "Hotel information not available",
+        "location": "Location not available",
+        "rating": 4.2,
+        "unique_features": "",
+        "nightly_rate": 0,
+        "url": ""
+    }],
+    "daily_schedule": [_empty_day(1, "", rating=4.2)],
+    "travel_tips": {
+        "weather": "Weather information not available",
+        "transportation": "Transportation information not available",
+        "cultural_notes": "Cultural information not available"
     }
-  ],
-  "travel_tips": {
-    "weather": "string (required)",
-    "transportation": "string (required)",
-    "cultural_notes": "string (required)"
-  }
 }
 
-STRICT REQUIREMENTS:
-1. Response MUST be valid JSON and ONLY JSON
-2. ALL fields marked (required) MUST be present and non-empty
+# Model for itinerary generation; the validation retry escalates to OPENAI_FALLBACK_MODEL
+OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+OPENAI_FALLBACK_MODEL = os.getenv('OPENAI_FALLBACK_MODEL', 'gpt-4o')
+
+# Hard per-attempt limit on a completion call, so a stalled request cannot hold a worker.
+# Streams get it per read; a non-streamed response arrives only once generation is done,
+# so its limit also allows for max_tokens generated at OPENAI_MIN_TOKENS_PER_SECOND.
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '45'))
+OPENAI_MIN_TOKENS_PER_SECOND = float(os.getenv('OPENAI_MIN_TOKENS_PER_SECOND', '25'))
+
+def _request_timeout(request: dict) -> float:
+    """Per-attempt timeout for a request, sized to its completion allowance."""
+    if request.get("stream"):
+        return OPENAI_TIMEOUT
+    max_tokens = request.get("max_tokens", _DEFAULT_COMPLETION_TOKENS)
+    return OPENAI_TIMEOUT + max_tokens / OPENAI_MIN_TOKENS_PER_SECOND
+
+# Longest Retry-After honored before retrying, so a retry stays within the request budget
+_MAX_RETRY_AFTER = 30.0
+_backoff = wait_random_exponential(min=2, max=10)
+
+def _wait_for_retry(retry_state) -> float:
+    """Wait as long as OpenAI's Retry-After header asks, else back off with jitter."""
+    response = getattr(retry_state.outcome.exception(), "response", None)
+    if response is not None:
+        try:
+            return min(float(response.headers["retry-after"]), _MAX_RETRY_AFTER)
+        except (KeyError, ValueError):
+            pass
+    return _backoff(retry_state)
+
+# Rate limits, 5xx responses, timeouts and connection failures are retried,
+# honoring Retry-After when OpenAI sends it; anything else (e.g. BadRequestError
+# for a bad prompt) is raised immediately.
+_retry_transient = retry(
+    retry=retry_if_exception_type(
+        (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+    ),
+    wait=_wait_for_retry,
+    stop=stop_after_attempt(3),
+    before_sleep=before_sleep_log(logger, logging.WARNING),
+    reraise=True
+)
+
+async def _send_chat_completion(request: dict):
+    """Wait for RPM/TPM budget from rate_limiter, then call chat.completions.create."""
+    await rate_limiter.acquire(_estimate_tokens(request))
+    return await get_client().chat.completions.create(**request, timeout=_request_timeout(request))
+
+@_retry_transient
+async def _create_chat_completion(**request):
+    """Call chat.completions.create, backing off with jitter on transient errors.
+
+    Each attempt holds a slot in inflight_semaphore, so concurrent requests
+    and per-day fan-out share one cap. Backoff sleeps hold no slot.
+    """
+    async with inflight_semaphore:
+        return await _send_chat_completion(request)
+
+@_retry_transient
+async def _open_chat_stream(**request):
+    """Open a streamed chat completion, retrying transient errors like _create_chat_completion.
+
+    Takes no inflight_semaphore slot itself: the caller must hold one until the
+    stream has been fully read.
+    """
+    return await _send_chat_completion({**request, "stream": True})
+
+# Tokenizer for TPM estimates, set by load_encoding at startup. OPENAI_MODEL and
+# OPENAI_FALLBACK_MODEL are both gpt-4o models and share one tokenizer.
+_encoding: Optional[tiktoken.Encoding] = None
+
+def load_encoding() -> None:
+    """Load the tokenizer used for TPM estimates; blocking, so run it off the event loop.
+
+    tiktoken downloads its BPE file on first use unless TIKTOKEN_CACHE_DIR
+    already holds it. If loading fails, tokens are estimated from text length
+    instead, since an estimate must never fail a request.
+    """
+    global _encoding
+    try:
+        try:
+            _encoding = tiktoken.encoding_for_model(OPENAI_MODEL)
+        except KeyError:
+            # Models newer than the installed tiktoken share the gpt-4o tokenizer
+            _encoding = tiktoken.get_encoding("o200k_base")
+    except Exception:
+        logger.warning("Could not load the tiktoken encoding, estimating tokens from text length", exc_info=True)
+
+@lru_cache(maxsize=256)
+def _count_tokens(text: str) -> int:
+    # The system message repeats on every call, so its count is cached
+    if _encoding is None:
+        # Roughly four characters per token for English text
+        return len(text) // 4
+    return len(_encoding.encode(text))
+
+def _estimate_tokens(request: dict) -> int:
+    """Prompt tokens plus the completion allowance, as counted against TPM."""
+    prompt_tokens = sum(_count_tokens(message["content"]) for message in request["messages"])
+    return prompt_tokens + request.get("max_tokens", _DEFAULT_COMPLETION_TOKENS)
+
+class OpenAIService:
+    # The JSON structure itself is enforced by the strict response_format schema,
+    # so the instructions only carry the content rules the schema cannot express.
+    SYSTEM_INSTRUCTIONS: Final[str] = """You are a travel planning API. Return only JSON conforming to the provided schema.
+
+CONTENT RULES:
+1. Include exactly 3 hotels in accommodation
+2. Include a daily_schedule entry for EACH day of the trip, numbered from 1
 3. ALL dates must be in YYYY-MM-DD format
 4. ALL ratings must be between 4.2 and 5.0
-5. Include exactly 3 hotels in accommodation array
-6. URLs must be real, working, official websites for the mentioned places/activities
-7. URLs should link to the official business website or a reliable booking/information page
-8. URLs do not need to match the business name exactly
-9. Include a daily_schedule entry for EACH day of the trip
-10. NEVER include additional fields or objects
-11. NEVER include explanatory text or comments
-12. NEVER use null values - use empty strings for optional fields
-13. Each day must have different activities and dining spots
-14. Nightly rate should be a **numeric value ONLY** with **no currency symbols**, such as `100`. The value should be a whole number, not a decimal.
-15. NEVER use control characters or non-printable characters in the JSON response.
+5. Hotel descriptions and activity descriptions are 2-3 sentences; meal descriptions are 1-2 sentences
+6. nightly_rate is a whole number with no currency symbol, such as 100
+7. Every field must be non-empty; never invent extra fields
+8. URLs must be real, working official websites or reliable booking/information pages for the places mentioned; they need not match the business name exactly
+9. Each day must have different activities and dining spots
 
 STRICT BUDGET RESTRICTIONS:
-1. For budget_preference "BUDGET": total daily cost including accommodation must be $100-200
-2. For budget_preference "COMFORT": total daily cost including accommodation must be $200-400
-3. For budget_preference "PREMIUM": total daily cost including accommodation must be $400-800
-4. For budget_preference "LUXURY": total daily cost including accommodation must be $800-1500
-5. For budget_preference "ULTRA_LUXURY": total daily cost including accommodation must be $1500+
-6. ALL accommodation and dining choices must fit within these daily budget ranges
-7. Daily budget must cover accommodation, meals, and activities
-8. Restaurant and activity choices should align with the budget tier
+Total daily cost, including accommodation, meals and activities, must fit the budget_preference:
+- BUDGET: $100-200
+- COMFORT: $200-400
+- PREMIUM: $400-800
+- LUXURY: $800-1500
+- ULTRA_LUXURY: $1500+
+Accommodation, restaurant and activity choices must all align with this tier.
 """
 
-    # Add this right after SYSTEM_INSTRUCTIONS and before generate_trip_plan
+    # Built once so every request sends the same system message object; the
+    # prefix stays byte-identical, which is what OpenAI's prompt cache keys on.
+    _SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_INSTRUCTIONS}
+
     @staticmethod
-    def validate_response_structure(data: dict) -> bool:
-        """Validate the OpenAI response matches our required schema."""
-        try:
-            # Validate accommodation
-            if not isinstance(data.get('accommodation'), list) or len(data['accommodation']) == 0:
-                return False
-            
-            for hotel in data['accommodation']:
-                required_hotel_fields = ['name', 'description', 'location', 'rating', 'unique_features', 'nightly_rate', 'url']
-                if not all(field in hotel for field in required_hotel_fields):
-                    return False
-                if not (4.2 <= float(hotel['rating']) <= 5.0):
-                    return False
-
-            # Validate daily_schedule
-            if not isinstance(data.get('daily_schedule'), list) or len(data['daily_schedule']) == 0:
-                return False
-                    
-            for day in data['daily_schedule']:
-                required_day_fields = ['day_number', 'date', 'breakfast', 'morning_activity', 
-                                    'lunch', 'afternoon_activity', 'dinner', 'evening_activity']
-                if not all(field in day for field in required_day_fields):
-                    return False
-                    
-                # Validate date format
-                try:
-                    datetime.strptime(day['date'], '%Y-%m-%d')
-                except ValueError:
-                    return False
-                    
-                # Validate meal entries
-                for meal in ['breakfast', 'lunch', 'dinner']:
-                    if not all(field in day[meal] for field in ['spot', 'rating', 'description', 'url']):
-                        return False
-                    if not (4.2 <= float(day[meal]['rating']) <= 5.0):
-                        return False
-                    
-                # Validate activities
-                for activity in ['morning_activity', 'afternoon_activity', 'evening_activity']:
-                    if not all(field in day[activity] for field in ['activity', 'description', 'url']):
-                        return False
-
-            # Validate travel_tips
-            required_tips_fields = ['weather', 'transportation', 'cultural_notes']
-            if not all(field in data.get('travel_tips', {}) for field in required_tips_fields):
-                return False
-
-            return True
-
-        except (TypeError, ValueError, KeyError):
-            return False
+    async def close() -> None:
+        """Close the shared OpenAI client and its connection pool."""
+        global _client
+        if _client is not None:
+            await _client.close()
+            _client = None
+
+    @staticmethod
+    def _chat_request(
+        prompt: str,
+        correction: Optional[str] = None,
+        response_format: dict = TRIP_PLAN_RESPONSE_FORMAT,
+        max_tokens: Optional[int] = None,
+        model: str = OPENAI_MODEL
+    ) -> dict:
+        """Build the chat completion request body.
+
+        A correction, if given, is appended as a trailing system message.
+        max_tokens is only sent when given, so unsized requests keep the model's limit.
+        """
+        messages = [
+            OpenAIService._SYSTEM_MESSAGE,
+            {"role": "user", "content": prompt}
+        ]
+        if correction:
+            messages.append({"role": "system", "content": correction})
+        request = {
+            "model": model,
+            "messages": messages,
+            "temperature": 0.0,
+            # Fixed seed so repeated prompts sample identically on the same backend
+            "seed": 0,
+            "response_format": response_format
+        }
+        if max_tokens is not None:
+            request["max_tokens"] = max_tokens
+        return request
 
     @staticmethod
-    async def generate_trip_plan(prompt: str) -> str:
+    async def generate_trip_plan(
+        prompt: str,
+        correction: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        model: str = OPENAI_MODEL
+    ) -> str:
         """Generate itinerary using OpenAI."""
+        return await OpenAIService._complete(
+            OpenAIService._chat_request(prompt, correction, max_tokens=max_tokens, model=model)
+        )
+
+    @staticmethod
+    async def _complete(request: dict, cache_key: Optional[str] = None) -> str:
+        """Return the completion text for a request, serving repeats from the cache.
+
+        cache_key, if given, must be ResponseCache.make_key(request).
+        """
+        if cache_key is None:
+            cache_key = ResponseCache.make_key(request)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
-            response = client.chat.completions.create(
-                model="gpt-4-1106-preview",
-                messages=[
-                    {"role": "system", "content": OpenAIService.SYSTEM_INSTRUCTIONS},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.0,
-                response_format={"type": "json_object"}
-            )
-            
-            if not response.choices:
-                raise Exception("No response generated from OpenAI")
-            
-            # The response is already valid JSON, just return it directly
-            return response.choices[0].message.content
-                
-        except Exception as e:
-            print(f"Error generating trip plan: {str(e)}")
+            response = await _create_chat_completion(**request)
+        except OpenAIError:
+            # Transient errors have already been retried by _create_chat_completion
+            logger.exception("OpenAI chat completion failed for model %s", request["model"])
             raise
 
+        if not response.choices:
+            raise Exception("No response generated from OpenAI")
+
+        _log_prompt_cache_usage(response.usage)
+        # Seeded outputs are only reproducible within one backend configuration
+        logger.debug("Completion from %s, system_fingerprint %s", response.model, response.system_fingerprint)
 
+        # The response is already valid JSON, just return it directly
+        content = response.choices[0].message.content
+        response_cache.set(cache_key, content)
+        return content
 
     @staticmethod
-    def parse_itinerary_response(response_text: str) -> dict:
-        """Parse OpenAI response from JSON format into structured data."""
+    async def generate_day_plan(
+        day_number: int,
+        day_date: str,
+        context: str,
+        outline: Optional[dict] = None,
+        model: str = OPENAI_MODEL
+    ) -> dict:
+        """Generate the schedule for a single day of the trip described by context.
+
+        outline, the day's day_outlines entry from the trip overview, names the
+        spots and activities to plan, so concurrent day calls do not pick the
+        same places.
+        """
+        prompt = f"{context}\nPlan only Day {day_number} - {day_date} of this trip."
+        if outline:
+            picks = "; ".join(f"{slot.replace('_', ' ')}: {outline[slot]}" for slot in _DAY_SLOTS)
+            prompt += f" Use exactly these picks - {picks}."
+        prompt += (
+            f" Return that single daily_schedule entry with day_number {day_number} "
+            f"and date {day_date}."
+        )
+        request = OpenAIService._chat_request(
+            prompt,
+            response_format=DAY_SCHEDULE_RESPONSE_FORMAT,
+            max_tokens=_DAY_COMPLETION_TOKENS,
+            model=model
+        )
+        day = await OpenAIService._complete_as(request, DaySchedule)
+        # The stitched plan relies on these, so do not trust the model to echo them
+        day["day_number"] = day_number
+        day["date"] = day_date
+        return day
+
+    @staticmethod
+    async def _generate_trip_overview(context: str, num_days: int, model: str = OPENAI_MODEL) -> dict:
+        """Generate the accommodation, travel tips and per-day outline for the trip described by context."""
+        prompt = (
+            f"{context}\nReturn only the accommodation, travel_tips and day_outlines for this trip: "
+            f"one day_outlines entry for each of the {num_days} days, naming that day's breakfast, "
+            f"lunch and dinner spots and its morning, afternoon and evening activities. "
+            f"No spot or activity may appear on more than one day."
+        )
+        request = OpenAIService._chat_request(
+            prompt,
+            response_format=TRIP_OVERVIEW_RESPONSE_FORMAT,
+            max_tokens=_OVERVIEW_COMPLETION_TOKENS + _OUTLINE_DAY_COMPLETION_TOKENS * num_days,
+            model=model
+        )
+        return await OpenAIService._complete_as(request, TripOverview)
+
+    @staticmethod
+    async def _complete_as(request: dict, schema: type[BaseModel]) -> dict:
+        """Complete a request and validate the response against schema.
+
+        A response that fails validation is dropped from the cache before the
+        ValidationError propagates, so a repeat of the request is regenerated.
+        """
+        response_text = await OpenAIService._complete(request)
         try:
-            # Direct parse of the JSON response
-            parsed_data = json.loads(response_text)
-            
-            # Add validation check
-            if OpenAIService.validate_response_structure(parsed_data):
-                print("\n=== Successfully parsed and validated JSON response ===")
-                return parsed_data
-                
-            print("\n=== JSON parsed but failed validation, returning default structure ===")
-            return {
-                "accommodation": [{
-                    "name": "Default Hotel",
-                    "description": "Hotel information not available",
-                    "location": "Location not available",
-                    "rating": 4.2,
-                    "unique_features": [],
-                    "nightly_rate": "Price not available",
-                    "website": None
-                }],
-                "daily_schedule": [{
-                    "day_number": 1,
-                    "date": date.today().isoformat(),
-                    "breakfast": {"spot": "", "rating": 4.2, "description": "", "url": None},
-                    "morning_activity": {"activity": "", "description": "", "url": None},
-                    "lunch": {"spot": "", "rating": 4.2, "description": "", "url": None},
-                    "afternoon_activity": {"activity": "", "description": "", "url": None},
-                    "dinner": {"spot": "", "rating": 4.2, "description": "", "url": None},
-                    "evening_activity": {"activity": "", "description": "", "url": None}
-                }],
-                "travel_tips": {
-                    "weather": "Weather information not available",
-                    "transportation": "Transportation information not available",
-                    "cultural_notes": "Cultural information not available"
-                }
-            }
-        except json.JSONDecodeError as e:
-            print(f"Failed to parse JSON: {str(e)}")
-            # Return the default structure if parsing fails
-            return {
-                # Same default structure as above
-            }
+            return schema.model_validate_json(response_text).model_dump()
+        except ValidationError:
+            response_cache.discard(ResponseCache.make_key(request))
+            raise
 
+    @staticmethod
+    async def _complete_part(part: partial) -> dict:
+        """Run one part of a per-day itinerary, regenerating it on OPENAI_FALLBACK_MODEL if it fails validation."""
+        try:
+            return await part()
+        except ValidationError as e:
+            logger.warning("Itinerary part failed validation, regenerating on %s: %s", OPENAI_FALLBACK_MODEL, e)
+            return await part(model=OPENAI_FALLBACK_MODEL)
 
     @staticmethod
-    def _parse_meal(text: str) -> dict:
-        """Parse meal details from text into structured format."""
-        result = {
-            "spot": "",
-            "rating": 0.0,
-            "description": "",
-            "url": None
+    async def generate_trip_plan_by_day(context: str, dates: list[date]) -> dict:
+        """Generate an itinerary as one overview call followed by one concurrent call per day.
+
+        The overview picks the hotels, travel tips and every day's spots and
+        activities in one call, so no two days repeat; each day call then plans
+        only its outlined picks. Output is generated at a fixed token rate, so
+        wallclock is roughly the overview plus the slowest day instead of the
+        whole trip. Concurrency is capped by OPENAI_CONCURRENCY. Parts that fail
+        schema validation are regenerated on OPENAI_FALLBACK_MODEL; if a part
+        fails again, or the outline or the days repeat a pick, falls back to a
+        single generate_validated_trip_plan call.
+        """
+        fallback = partial(OpenAIService.generate_validated_trip_plan, context, completion_budget(len(dates)))
+        try:
+            overview = await OpenAIService._complete_part(
+                partial(OpenAIService._generate_trip_overview, context, len(dates))
+            )
+        except ValidationError as e:
+            logger.warning("Itinerary overview failed validation, generating in one call: %s", e)
+            return await fallback()
+
+        outlines = overview["day_outlines"]
+        outline_picks = [[outline[slot] for slot in _DAY_SLOTS] for outline in outlines]
+        if len(outlines) != len(dates) or OpenAIService._has_repeated_entries(outline_picks):
+            logger.warning("Itinerary outline does not give each day distinct picks, generating in one call")
+            return await fallback()
+
+        # Wait for every day, so none is left running if we fall back
+        days = await asyncio.gather(
+            *(
+                OpenAIService._complete_part(
+                    partial(OpenAIService.generate_day_plan, day_number, day_date.isoformat(), context, outline)
+                )
+                for day_number, (day_date, outline) in enumerate(zip(dates, outlines), start=1)
+            ),
+            return_exceptions=True
+        )
+        for day in days:
+            if isinstance(day, BaseException) and not isinstance(day, ValidationError):
+                raise day
+        errors = [day for day in days if isinstance(day, ValidationError)]
+        if errors:
+            logger.warning("Per-day itinerary failed validation, generating in one call: %s", errors[0])
+            return await fallback()
+
+        day_picks = [
+            [day[meal]["spot"] for meal in _MEAL_SLOTS] + [day[activity]["activity"] for activity in _ACTIVITY_SLOTS]
+            for day in days
+        ]
+        if OpenAIService._has_repeated_entries(day_picks):
+            # A day call strayed from its outline onto another day's pick
+            logger.warning("Per-day itinerary repeats spots or activities across days, generating in one call")
+            return await fallback()
+        # Every part was validated against its schema, so the stitched plan is a valid TripPlan
+        return {
+            "accommodation": overview["accommodation"],
+            "daily_schedule": days,
+            "travel_tips": overview["travel_tips"]
         }
-        
-        # Remove the prefix (e.g., "Breakfast:", "Lunch:", "Dinner:")
-        text = re.sub(r'^[^:]+:\s*', '', text)
-        
-        # Extract URL if present
-        url_match = re.search(r'\((https?://[^\s)]+)\)', text)
-        if url_match:
-            result['url'] = url_match.group(1)
-            text = re.sub(r'\([^)]+\)', '', text)
-        
-        # Extract rating if present
-        rating_match = re.search(r'(\d+\.?\d*)', text)
-        if rating_match:
-            try:
-                result['rating'] = float(rating_match.group(1))
-            except ValueError:
-                pass
-            text = re.sub(r'\(.*?\)', '', text)
-        
-        # Split remaining text into spot and description
-        parts = text.split(' - ', 1)
-        result['spot'] = parts[0].strip()
-        if len(parts) > 1:
-            result['description'] = parts[1].strip()
-        
-        return result
 
     @staticmethod
-    def _parse_activity(text: str) -> dict:
-        """Parse activity details from text into structured format."""
-        result = {
-            "activity": "",
-            "description": "",
-            "url": None
-        }
-        
-        # Remove the prefix (e.g., "Morning Activity:", etc.)
-        text = re.sub(r'^[^:]+:\s*', '', text)
-        
-        # Extract URL if present
-        url_match = re.search(r'\((https?://[^\s)]+)\)', text)
-        if url_match:
-            result['url'] = url_match.group(1)
-            text = re.sub(r'\([^)]+\)', '', text)
-        
-        # Split remaining text into activity and description
-        parts = text.split(' - ', 1)
-        result['activity'] = parts[0].strip()
-        if len(parts) > 1:
-            result['description'] = parts[1].strip()
-        
-        return result
+    def _has_repeated_entries(picks: list[list[str]]) -> bool:
+        """Return True if any name appears more than once across the per-day lists of picks."""
+        seen = set()
+        for names in picks:
+            for name in names:
+                key = " ".join(name.casefold().split())
+                if key in seen:
+                    return True
+                seen.add(key)
+        return False
 
     @staticmethod
-    def _parse_accommodation(text: str) -> list[dict]:
-        """Parse hotel details into structured format."""
-        hotels = []
-        current_hotel = {}
-        
-        for line in text.split('\n'):
-            line = line.strip()
-            if not line or line == 'ACCOMMODATION:':
-                continue
-                
-            # Parse hotel details
-            if line.startswith('- Name:'):
-                if current_hotel:
-                    hotels.append(current_hotel)
-                current_hotel = {
-                    "name": line.replace('- Name:', '').strip(),
-                    "description": "",
-                    "location": "",
-                    "rating": 0.0,
-                    "unique_features": [],
-                    "nightly_rate": "",
-                    "website": None
-                }
-            elif 'Description:' in line:
-                current_hotel['description'] = line.split('Description:', 1)[1].strip()
-            elif 'Location:' in line:
-                current_hotel['location'] = line.split('Location:', 1)[1].strip()
-            elif 'Rating:' in line:
-                try:
-                    current_hotel['rating'] = float(re.search(r'(\d+\.?\d*)', line).group(1))
-                except (AttributeError, ValueError):
-                    pass
-            elif 'Unique Features:' in line:
-                current_hotel['unique_features'] = [
-                    f.strip() for f in line.split('Unique Features:', 1)[1].split(',')
-                ]
-            elif 'Nightly Rate:' in line:
-                current_hotel['nightly_rate'] = line.split('Nightly Rate:', 1)[1].strip()
-            elif 'Website:' in line:
-                website_match = re.search(r'\((.*?)\)', line)
-                if website_match:
-                    current_hotel['website'] = website_match.group(1)
-        
-        if current_hotel:
-            hotels.append(current_hotel)
-        
-        return hotels
+    async def stream_trip_plan(prompt: str, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """Yield itinerary JSON fragments as OpenAI generates them.
+
+        The concatenated fragments are the same text generate_trip_plan returns.
+        Once the stream ends, the text is cached only if generation finished
+        normally and it validates as a TripPlan; otherwise an Exception or
+        ValidationError is raised after the last fragment. The stream holds an
+        inflight_semaphore slot until it is fully read, and is closed if the
+        consumer stops early (e.g. the client disconnects).
+        """
+        request = OpenAIService._chat_request(prompt, max_tokens=max_tokens)
+        cache_key = ResponseCache.make_key(request)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        finish_reason = None
+        async with inflight_semaphore:
+            stream = await _open_chat_stream(**request)
+            async with stream:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    choice = chunk.choices[0]
+                    finish_reason = choice.finish_reason or finish_reason
+                    delta = choice.delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+
+        # A truncated ("length") or filtered stream must not be served from the cache later
+        if finish_reason != "stop":
+            raise Exception(f"Itinerary stream ended with finish_reason {finish_reason}")
+        content = ''.join(parts)
+        TripPlan.model_validate_json(content)
+        response_cache.set(cache_key, content)
 
     @staticmethod
-    def _parse_daily_activities(text: str) -> list[dict]:
-        """Parse daily activities into structured format."""
-        days = []
-        current_day = None
-        
-        for line in text.split('\n'):
-            line = line.strip()
-            if not line or line == 'DAILY ITINERARY:':
-                continue
-                
-            day_match = re.match(r'Day (\d+) - (\d{4}-\d{2}-\d{2}):', line)
-            if day_match:
-                if current_day:
-                    days.append(current_day)
-                current_day = {
-                    "day_number": int(day_match.group(1)),
-                    "date": day_match.group(2),
-                    "breakfast": {"spot": "", "rating": 0.0, "description": "", "url": None},
-                    "morning_activity": {"activity": "", "description": "", "url": None},
-                    "lunch": {"spot": "", "rating": 0.0, "description": "", "url": None},
-                    "afternoon_activity": {"activity": "", "description": "", "url": None},
-                    "dinner": {"spot": "", "rating": 0.0, "description": "", "url": None},
-                    "evening_activity": {"activity": "", "description": "", "url": None}
-                }
-            elif current_day:
-                if line.startswith('Breakfast:'):
-                    current_day['breakfast'] = OpenAIService._parse_meal(line)
-                elif line.startswith('Morning Activity:'):
-                    current_day['morning_activity'] = OpenAIService._parse_activity(line)
-                elif line.startswith('Lunch:'):
-                    current_day['lunch'] = OpenAIService._parse_meal(line)
-                elif line.startswith('Afternoon Activity:'):
-                    current_day['afternoon_activity'] = OpenAIService._parse_activity(line)
-                elif line.startswith('Dinner:'):
-                    current_day['dinner'] = OpenAIService._parse_meal(line)
-                elif line.startswith('Evening Activity:'):
-                    current_day['evening_activity'] = OpenAIService._parse_activity(line)
-        
-        if current_day:
-            days.append(current_day)
-        
-        return days
+    async def stream_trip_plan_sections(
+        prompt: str,
+        max_tokens: Optional[int] = None
+    ) -> AsyncIterator[tuple[str, Any]]:
+        """Yield (section, value) pairs as each part of the itinerary completes.
+
+        Sections arrive in generation order: "accommodation", one "day" per
+        daily_schedule entry, then "travel_tips".
+        """
+        sections = SectionStream()
+        async for fragment in OpenAIService.stream_trip_plan(prompt, max_tokens):
+            for section in sections.feed(fragment):
+                yield section
 
     @staticmethod
-    def _parse_travel_tips(text: str) -> dict:
-        """Parse travel tips into structured format."""
-        tips = {}
-        current_tip = None
+    def _validate_trip_plan(response_text: str) -> tuple[Optional[dict], Optional[str]]:
+        """Return (itinerary, None) if the response is valid, else (None, reason)."""
+        try:
+            # Single pass through pydantic-core: parses the JSON and checks the
+            # schema, rating bounds and date format together
+            parsed_data = TripPlan.model_validate_json(response_text).model_dump()
+        except ValidationError as e:
+            return None, str(e)
         
-        for line in text.split('\n'):
-            line = line.strip()
-            if not line or line == 'TRAVEL TIPS:':
-                continue
-                
-            if line.startswith('Weather:'):
-                current_tip = 'weather'
-                tips['weather'] = line.split('Weather:', 1)[1].strip()
-            elif line.startswith('Transportation:'):
-                current_tip = 'transportation'
-                tips['transportation'] = line.split('Transportation:', 1)[1].strip()
-            elif line.startswith('Cultural Notes:'):
-                current_tip = 'cultural_notes'
-                tips['cultural_notes'] = line.split('Cultural Notes:', 1)[1].strip()
-            elif current_tip and line:
-                tips[current_tip] += ' ' + line
+        return parsed_data, None
+
+    @staticmethod
+    async def generate_validated_trip_plan(prompt: str, max_tokens: Optional[int] = None) -> dict:
+        """Generate and parse an itinerary, re-asking once if it fails validation.
+
+        The retry tells the model why its previous response was rejected and
+        goes to OPENAI_FALLBACK_MODEL, so the cheaper default model is gated by
+        validation. If the corrected response is also invalid, the default
+        structure is returned.
+        """
+        request = OpenAIService._chat_request(prompt, max_tokens=max_tokens)
+        cache_key = ResponseCache.make_key(request)
+        cached = parsed_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        response_text = await OpenAIService._complete(request, cache_key)
+        parsed_data, error = await asyncio.to_thread(OpenAIService._validate_trip_plan, response_text)
+        if parsed_data is not None:
+            parsed_cache.set(cache_key, parsed_data)
+            return parsed_data
+
+        logger.warning("Itinerary failed validation, retrying with correction: %s", error)
+        # Keep the rejected completion from being served again for this prompt
+        response_cache.discard(cache_key)
+        correction = f"Previous response failed schema validation: {error}. Return JSON only."
+        correction_request = OpenAIService._chat_request(
+            prompt, correction, max_tokens=max_tokens, model=OPENAI_FALLBACK_MODEL
+        )
+        response_text = await OpenAIService._complete(correction_request)
+        parsed_data, error = await asyncio.to_thread(OpenAIService._validate_trip_plan, response_text)
+        if parsed_data is not None:
+            parsed_cache.set(cache_key, parsed_data)
+            return parsed_data
+
+        # Dropped as well, so a repeat of the prompt asks OPENAI_FALLBACK_MODEL again
+        response_cache.discard(ResponseCache.make_key(correction_request))
+        logger.warning("Corrected itinerary failed validation, returning default structure: %s", error)
+        return OpenAIService._default_trip_plan()
+
+    @staticmethod
+    def parse_itinerary_response(response_text: str) -> dict:
+        """Parse OpenAI response from JSON format into structured data."""
+        parsed_data, error = OpenAIService._validate_trip_plan(response_text)
+        if parsed_data is not None:
+            logger.debug("Parsed and validated itinerary: %s", parsed_data)
+            return parsed_data
         
-        return tips
+        logger.warning("Itinerary failed validation, returning default structure: %s", error)
+        return OpenAIService._default_trip_plan()
+
+    @staticmethod
+    def _default_trip_plan() -> dict:
+        """Return a copy of the default structure, dated today."""
+        default = copy.deepcopy(_DEFAULT_TRIP_PLAN)
+        default["daily_schedule"][0]["date"] = date.today().isoformat()
+        return default
@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+class RateLimiter:
+    """Client-side token buckets for requests per minute and tokens per minute.
+
+    Both buckets refill continuously on a monotonic clock. acquire() waits
+    until a request fits in both, so bursts queue locally instead of
+    turning into 429s and retry storms.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._available_requests = requests_per_minute
+        self._available_tokens = tokens_per_minute
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed_minutes = (now - self._last_refill) / 60
+        self._last_refill = now
+        self._available_requests = min(
+            self.requests_per_minute,
+            self._available_requests + elapsed_minutes * self.requests_per_minute
+        )
+        self._available_tokens = min(
+            self.tokens_per_minute,
+            self._available_tokens + elapsed_minutes * self.tokens_per_minute
+        )
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait until one request and `tokens` tokens are available, then take them."""
+        # A single call larger than the whole bucket could otherwise never proceed
+        tokens = min(tokens, self.tokens_per_minute)
+
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._available_requests >= 1 and self._available_tokens >= tokens:
+                    self._available_requests -= 1
+                    self._available_tokens -= tokens
+                    return
+
+                wait_seconds = 60 * max(
+                    (1 - self._available_requests) / self.requests_per_minute,
+                    (tokens - self._available_tokens) / self.tokens_per_minute
+                )
+                await asyncio.sleep(wait_seconds)
@@ -0,0 +1,75 @@
+import hashlib
+import time
+from typing import Any, Optional
+
+import orjson
+
+# Digests of large request values that never change, such as the strict
+# response_format schemas, keyed by id. Each entry keeps its value alive so
+# the id cannot be reused by another object.
+_static_digests: dict[int, tuple[Any, str]] = {}
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(orjson.dumps(value, option=orjson.OPT_SORT_KEYS, default=str)).hexdigest()
+
+class ResponseCache:
+    """In-process TTL cache for deterministic OpenAI completions and their parsed results."""
+
+    def __init__(self, ttl_seconds: float = 86400, max_entries: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[str, tuple[Any, float]] = {}
+
+    @staticmethod
+    def make_key(request: dict) -> str:
+        """Hash the full request body (model, messages, temperature, ...).
+
+        User message text is casefolded and whitespace-collapsed first, so
+        prompts that differ only in how a destination or note was typed
+        ("new york " vs "New York") share an entry.
+        """
+        messages = [
+            {**message, "content": " ".join(message["content"].casefold().split())}
+            if message.get("role") == "user" else message
+            for message in request.get("messages", ())
+        ]
+        payload = {**request, "messages": messages}
+        # A registered value is replaced by its digest instead of being serialized again
+        for field, value in request.items():
+            static = _static_digests.get(id(value))
+            if static is not None and static[0] is value:
+                payload[field] = static[1]
+        return _digest(payload)
+
+    @staticmethod
+    def register_static(value: Any) -> None:
+        """Hash a request value that never changes once, so make_key reuses the digest.
+
+        The value must not be mutated afterwards.
+        """
+        _static_digests[id(value)] = (value, _digest(value))
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached completion, or None on a miss or expired entry."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            content, stored_at = entry
+            if time.monotonic() - stored_at < self.ttl_seconds:
+                self.hits += 1
+                return content
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def set(self, key: str, content: Any) -> None:
+        """Store content, evicting the oldest entry once max_entries is reached."""
+        self._entries.pop(key, None)
+        if len(self._entries) >= self.max_entries:
+            # dicts keep insertion order, so the first key is the oldest entry
+            del self._entries[next(iter(self._entries))]
+        self._entries[key] = (content, time.monotonic())
+
+    def discard(self, key: str) -> None:
+        self._entries.pop(key, None)
@@ -0,0 +1,60 @@
+from typing import Any
+
+import orjson
+
+class SectionStream:
+    """Incrementally split streamed itinerary JSON into completed sections.
+
+    Fed the text fragments of a TripPlan object as they arrive, it returns each
+    top-level value as soon as its closing bracket is seen, and each
+    daily_schedule entry as soon as that day closes, so callers can forward
+    hotels and early days before generation finishes. Each character is
+    scanned once.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._starts: list[int] = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_key = None
+        self._key = None
+
+    def feed(self, fragment: str) -> list[tuple[str, Any]]:
+        """Consume a fragment and return (section, value) pairs completed by it.
+
+        Sections are "accommodation", "travel_tips" and "day" (one per
+        daily_schedule entry); the daily_schedule array itself is not repeated.
+        """
+        self._text += fragment
+        completed = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            depth = len(self._starts)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if depth == 1:
+                        self._last_key = text[self._string_start + 1:i]
+            elif char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == ':' and depth == 1:
+                self._key = self._last_key
+            elif char in '{[':
+                self._starts.append(i)
+            elif char in '}]':
+                start = self._starts.pop()
+                if depth == 2 and self._key != "daily_schedule":
+                    completed.append((self._key, orjson.loads(text[start:i + 1])))
+                elif depth == 3 and self._key == "daily_schedule":
+                    completed.append(("day", orjson.loads(text[start:i + 1])))
+        self._pos = len(text)
+        return completed